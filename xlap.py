@@ -9,66 +9,151 @@ hotkeys (Super + Alt + Arrow Keys) and a system tray indicator menu.
 
 Dependencies on Debian/Kali Linux:
 - python3-gi
-- python3-pynput
+- python3-xlib
 - gir1.2-gtk-3.0
 - gir1.2-appindicator3-0.1 (or gir1.2-ayatanaappindicator3-0.1)
-- xdotool
-- libnotify-bin (for notify-send)
+- gir1.2-notify-0.7 (or libnotify-bin for notify-send)
+- python3-orjson (optional, for faster config parsing)
 
 Installation of Dependencies:
 sudo apt update
-sudo apt install python3-gi python3-pynput gir1.2-gtk-3.0 \
-                 gir1.2-appindicator3-0.1 xdotool libnotify-bin
+sudo apt install python3-gi python3-xlib gir1.2-gtk-3.0 \
+                 gir1.2-appindicator3-0.1 gir1.2-notify-0.7
 """
 
+from __future__ import annotations
+
 import json
 import os
-import re
+import shutil
 import signal
-import subprocess
 import sys
-from functools import partial
+import time
+import types
+from collections import OrderedDict
 from json import JSONDecodeError
 from pathlib import Path
-from threading import Thread
-from typing import Dict, List, Optional, Tuple, Any
-
-from pynput import keyboard
-
-import gi
 
-# --- GTK Indicator Setup ---
 try:
-    gi.require_version("Gtk", "3.0")
-    from gi.repository import Gtk
-except (ValueError, ImportError):
-    print("Error: GTK 3.0 bindings not found. Please install 'gir1.2-gtk-3.0'.")
+    from Xlib import XK, X
+    from Xlib.display import Display
+    from Xlib.error import BadAccess, BadWindow, CatchError, XError
+    from Xlib.ext import randr
+    from Xlib.protocol import event
+    from Xlib.xobject.drawable import Window
+except ImportError:
+    print("Error: python-xlib not found. Please install 'python3-xlib'.")
     sys.exit(1)
 
+# --- GTK Indicator Setup ---
+# GI modules, imported by _load_gtk() once the indicator is actually needed
+GLib = Gtk = AppIndicator3 = GNotify = None
+
 
 def gtk_module_exists(module_name: str, version: str) -> bool:
     """Checks if a GI repository is available."""
     try:
+        import gi
+
         gi.require_version(module_name, version)
         return True
     except (ValueError, ImportError):
         return False
 
 
-if gtk_module_exists("AppIndicator3", "0.1"):
-    from gi.repository import AppIndicator3
-elif gtk_module_exists("AyatanaAppIndicator3", "0.1"):
-    from gi.repository import AyatanaAppIndicator3 as AppIndicator3
-else:
-    print("Error: Requires either AppIndicator3 or AyatanaAppIndicator3.")
-    print(
-        "Please install 'gir1.2-appindicator3-0.1' or 'gir1.2-ayatanaappindicator3-0.1'."
-    )
-    sys.exit(1)
+def _load_gtk() -> None:
+    """Imports the GTK, indicator and libnotify bindings, or exits."""
+    global GLib, Gtk, AppIndicator3, GNotify
+
+    if not gtk_module_exists("Gtk", "3.0"):
+        print("Error: GTK 3.0 bindings not found. Please install 'gir1.2-gtk-3.0'.")
+        sys.exit(1)
+    from gi.repository import GLib, Gtk
+
+    if gtk_module_exists("AppIndicator3", "0.1"):
+        from gi.repository import AppIndicator3
+    elif gtk_module_exists("AyatanaAppIndicator3", "0.1"):
+        from gi.repository import AyatanaAppIndicator3 as AppIndicator3
+    else:
+        print("Error: Requires either AppIndicator3 or AyatanaAppIndicator3.")
+        print(
+            "Please install 'gir1.2-appindicator3-0.1' or 'gir1.2-ayatanaappindicator3-0.1'."
+        )
+        sys.exit(1)
+
+    # libnotify bindings are optional; notify-send is used when they are missing
+    if gtk_module_exists("Notify", "0.7"):
+        from gi.repository import Notify as GNotify
+
+        if not GNotify.init("Xlap"):
+            GNotify = None
+
+
+# orjson is optional; the stdlib json module is used when it is missing
+try:
+    import orjson
+
+    def json_loads(data: bytes):
+        """Parses a JSON document from bytes."""
+        return orjson.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        """Serializes an object to indented JSON bytes."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+
+except ImportError:
+
+    def json_loads(data: bytes):
+        """Parses a JSON document from bytes."""
+        return json.loads(data)
+
+    def json_dumps(obj) -> bytes:
+        """Serializes an object to indented JSON bytes."""
+        return json.dumps(obj, indent=2).encode("utf-8")
+
 
 # --- Debug Flag ---
 XLAP_DEBUG = os.environ.get("XLAP_DEBUG", "false").lower() in ("true", "1", "t")
 
+# _NET_WM_STATE client message actions (EWMH)
+_NET_WM_STATE_REMOVE = 0
+_NET_WM_STATE_ADD = 1
+
+# Most windows whose layout is remembered; the least recently tiled go first
+WINDOW_STATE_LIMIT = 256
+# Seconds after a snap during which a window's ConfigureNotify is taken to be
+# the result of that snap rather than a move by the user or the WM
+SNAP_SETTLE_TIME = 0.5
+
+# Helpers are launched with nothing to read on stdin and stdout discarded
+_SPAWN_FILE_ACTIONS = [
+    (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+    (os.POSIX_SPAWN_OPEN, 1, os.devnull, os.O_WRONLY, 0),
+]
+
+
+def spawn(argv: list[str]) -> int:
+    """Starts a program from PATH with posix_spawn and returns its pid."""
+    return os.posix_spawnp(
+        argv[0],
+        argv,
+        os.environ,
+        file_actions=_SPAWN_FILE_ACTIONS,
+        # Python ignores these at startup; restore them like subprocess does
+        setsigdef=(signal.SIGPIPE, signal.SIGXFSZ),
+    )
+
+
+def spawn_detached(argv: list[str]) -> None:
+    """Starts a program without waiting for it; GLib reaps it on exit."""
+    try:
+        pid = spawn(argv)
+    except OSError as e:
+        if XLAP_DEBUG:
+            print(f"Could not start {argv[0]}: {e}")
+        return
+    GLib.child_watch_add(GLib.PRIORITY_DEFAULT, pid, lambda *_: None)
+
 
 # --- Configuration Management ---
 class Config:
@@ -82,6 +167,7 @@ class Config:
     notify_on_launch: bool = True
 
     _config_path = Path.home() / ".xlap-conf.json"
+    _mtime: float | None = None  # mtime of the last successfully loaded file
 
     @classmethod
     def get_path(cls) -> Path:
@@ -89,35 +175,42 @@ class Config:
         return cls._config_path
 
     @classmethod
-    def load(cls) -> None:
-        """Loads configuration from the JSON file."""
+    def load(cls) -> bool:
+        """Loads configuration from the JSON file.
+
+        Returns True if the file was parsed, False if it was unchanged or invalid.
+        """
         if XLAP_DEBUG:
             print("Config: Loading configuration...")
 
-        if not cls._config_path.exists():
+        try:
+            mtime = cls._config_path.stat().st_mtime
+        except FileNotFoundError:
             cls.save_default()
+            mtime = cls._config_path.stat().st_mtime
+
+        if mtime == cls._mtime:
+            if XLAP_DEBUG:
+                print("Config: Unchanged since last load, skipping.")
+            return False
 
         try:
-            with open(cls._config_path, "r") as f:
-                data = json.load(f)
-                cls.window_margin_top = data.get(
-                    "window_margin_top", cls.window_margin_top
-                )
-                cls.window_margin_left = data.get(
-                    "window_margin_left", cls.window_margin_left
-                )
-                cls.screen_margin_bottom = data.get(
-                    "screen_margin_bottom", cls.screen_margin_bottom
-                )
-                cls.screen_margin_right = data.get(
-                    "screen_margin_right", cls.screen_margin_right
-                )
-                cls.notify_on_apply_layout = data.get(
-                    "notify_on_apply_layout", cls.notify_on_apply_layout
-                )
-                cls.notify_on_launch = data.get(
-                    "notify_on_launch", cls.notify_on_launch
-                )
+            data = json_loads(cls._config_path.read_bytes())
+            cls.window_margin_top = data.get("window_margin_top", cls.window_margin_top)
+            cls.window_margin_left = data.get(
+                "window_margin_left", cls.window_margin_left
+            )
+            cls.screen_margin_bottom = data.get(
+                "screen_margin_bottom", cls.screen_margin_bottom
+            )
+            cls.screen_margin_right = data.get(
+                "screen_margin_right", cls.screen_margin_right
+            )
+            cls.notify_on_apply_layout = data.get(
+                "notify_on_apply_layout", cls.notify_on_apply_layout
+            )
+            cls.notify_on_launch = data.get("notify_on_launch", cls.notify_on_launch)
+            cls._mtime = mtime
         except (JSONDecodeError, TypeError) as e:
             Notify.send(
                 summary="XLAP: Invalid Configuration",
@@ -126,9 +219,11 @@ class Config:
             )
             if XLAP_DEBUG:
                 print(f"Config Error: {e}")
+            return False
 
         if XLAP_DEBUG:
             print(f"Config: Loaded. Notify on apply: {cls.notify_on_apply_layout}")
+        return True
 
     @classmethod
     def save_default(cls) -> None:
@@ -141,8 +236,7 @@ class Config:
             "notify_on_apply_layout": cls.notify_on_apply_layout,
             "notify_on_launch": cls.notify_on_launch,
         }
-        with open(cls._config_path, "w") as f:
-            json.dump(default_conf, f, indent=4)
+        cls._config_path.write_bytes(json_dumps(default_conf))
         if XLAP_DEBUG:
             print(f"Config: Saved default configuration to {cls._config_path}")
 
@@ -190,7 +284,7 @@ class Layouts:
 
 # --- Data-Driven Layout Geometry ---
 # (x_factor, y_factor, width_factor, height_factor)
-LAYOUT_GEOMETRY: Dict[str, Tuple[float, float, float, float]] = {
+LAYOUT_GEOMETRY: dict[str, tuple[float, float, float, float]] = {
     Layouts.ALMOST_MAXIMIZED: (0.0, 0.0, 1.0, 1.0),
     Layouts.COL_50_LEFT: (0.0, 0.0, 0.5, 1.0),
     Layouts.COL_50_RIGHT: (0.5, 0.0, 0.5, 1.0),
@@ -255,8 +349,12 @@ LAYOUT_SEQUENCE = [
     Layouts.CELL_33_RIGHT_BOTTOM,
 ]
 
+# Position of each layout in LAYOUT_SEQUENCE, for O(1) lookups
+LAYOUT_INDEX: dict[str, int] = {name: i for i, name in enumerate(LAYOUT_SEQUENCE)}
+_MAXIMIZED_IDX = LAYOUT_INDEX[Layouts.MAXIMIZED]
+
 # Defines what layout to switch to from a source layout given a direction
-LAYOUT_TRANSITIONS: Dict[Tuple[str, str], str] = {
+LAYOUT_TRANSITIONS: dict[tuple[str, str], str] = {
     # From a 50% split, refine to a corner
     (Layouts.COL_50_LEFT, "up"): Layouts.CELL_50_LEFT_TOP,
     (Layouts.COL_50_LEFT, "down"): Layouts.CELL_50_LEFT_BOTTOM,
@@ -269,213 +367,440 @@ LAYOUT_TRANSITIONS: Dict[Tuple[str, str], str] = {
 }
 
 # Defines the default layout for a given direction if no other rule matches
-DEFAULT_TRANSITIONS: Dict[str, str] = {
+DEFAULT_TRANSITIONS: dict[str, str] = {
     "left": Layouts.COL_50_LEFT,
     "right": Layouts.COL_50_RIGHT,
     "up": Layouts.ROW_50_TOP,
     "down": Layouts.ROW_50_BOTTOM,
 }
 
+# Snap directions, in TRANSITION_TABLE column order
+DIRECTIONS = ("left", "right", "up", "down")
+DIRECTION_INDEX: dict[str, int] = {name: i for i, name in enumerate(DIRECTIONS)}
+
+
+def _build_transition_table() -> list[list[int]]:
+    """Flattens the transition maps into [layout_index][direction_index]."""
+    table = [
+        [LAYOUT_INDEX[DEFAULT_TRANSITIONS[direction]] for direction in DIRECTIONS]
+        for _ in LAYOUT_SEQUENCE
+    ]
+    for (layout, direction), new_layout in LAYOUT_TRANSITIONS.items():
+        row = table[LAYOUT_INDEX[layout]]
+        row[DIRECTION_INDEX[direction]] = LAYOUT_INDEX[new_layout]
+    return table
+
+
+# The layout index to switch to, per current layout index and direction index
+TRANSITION_TABLE: list[list[int]] = _build_transition_table()
+
+# Global hotkeys (Super + Alt + Arrow) and the direction each one snaps to
+HOTKEYS: dict[int, int] = {
+    XK.XK_Left: DIRECTION_INDEX["left"],
+    XK.XK_Right: DIRECTION_INDEX["right"],
+    XK.XK_Up: DIRECTION_INDEX["up"],
+    XK.XK_Down: DIRECTION_INDEX["down"],
+}
+HOTKEY_MODIFIERS = X.Mod4Mask | X.Mod1Mask
+# Grabs match modifiers exactly, so repeat them with CapsLock/NumLock on
+_LOCK_MASKS = (0, X.LockMask, X.Mod2Mask, X.LockMask | X.Mod2Mask)
+
 
 # --- Core Logic ---
 class XlapCore:
     """Encapsulates the core window management logic."""
 
     def __init__(self):
-        self._window_state: Dict[str, int] = {}  # {window_id: layout_index}
+        # {window_id: layout_index}, least recently tiled first
+        self._window_state: OrderedDict[int, int] = OrderedDict()
+        # {window_id: time.monotonic() of the last snap}
+        self._applied_at: dict[int, float] = {}
+        self._displays_cache: list[dict[str, int]] | None = None
+        # {(display_index, layout): (left, top, width, height)}
+        self._geom_cache: dict[tuple[int, str], tuple[int, int, int, int]] = {}
+        # {window_id: display}, kept until the window leaves that display
+        self._window_display_cache: dict[int, dict[str, int]] = {}
+
+        # A single X connection shared by all window operations
+        self._xdisplay = Display()
+        self._root = self._xdisplay.screen().root
+        self._net_active_window = self._xdisplay.intern_atom("_NET_ACTIVE_WINDOW")
+        self._wm_state = self._xdisplay.intern_atom("WM_STATE")
+        self._net_wm_state = self._xdisplay.intern_atom("_NET_WM_STATE")
+        self._state_atoms: dict[str, int] = {
+            "fullscreen": self._xdisplay.intern_atom("_NET_WM_STATE_FULLSCREEN"),
+            "maximized_vert": self._xdisplay.intern_atom(
+                "_NET_WM_STATE_MAXIMIZED_VERT"
+            ),
+            "maximized_horz": self._xdisplay.intern_atom(
+                "_NET_WM_STATE_MAXIMIZED_HORZ"
+            ),
+        }
 
-    def _run_command(self, cmd: List[str]) -> str:
-        """Executes a shell command and returns its stdout."""
-        try:
-            result = subprocess.run(
-                cmd, capture_output=True, text=True, check=True, encoding="utf-8"
-            )
-            return result.stdout.strip()
-        except FileNotFoundError:
-            Notify.send(
-                f"Error: Command '{cmd[0]}' not found.",
-                "Please ensure it's installed and in your PATH.",
-                expire_time=10000,
+        # Get notified of monitor hotplug so the display cache stays valid
+        self._randr_event_base: int | None = None
+        randr_ext = self._xdisplay.query_extension("RANDR")
+        if randr_ext:
+            self._randr_event_base = randr_ext.first_event
+            self._root.xrandr_select_input(randr.RRScreenChangeNotifyMask)
+            self._xdisplay.flush()
+        elif XLAP_DEBUG:
+            print("XRandR extension not available, treating screen as one display.")
+
+    @property
+    def xdisplay(self) -> Display:
+        """The X connection used for all window operations."""
+        return self._xdisplay
+
+    def grab_hotkeys(self) -> dict[int, int]:
+        """Grabs HOTKEYS on the root window and maps their keycodes to directions."""
+        directions: dict[int, int] = {}
+        catcher = CatchError(BadAccess)
+        for keysym, direction in HOTKEYS.items():
+            keycode = self._xdisplay.keysym_to_keycode(keysym)
+            if not keycode:
+                continue
+            directions[keycode] = direction
+            for lock_mask in _LOCK_MASKS:
+                self._root.grab_key(
+                    keycode,
+                    HOTKEY_MODIFIERS | lock_mask,
+                    True,
+                    X.GrabModeAsync,
+                    X.GrabModeAsync,
+                    onerror=catcher,
+                )
+        self._xdisplay.sync()
+        if catcher.get_error():
+            print(
+                "Warning: Some hotkeys are already grabbed by another application.",
+                file=sys.stderr,
             )
+        if XLAP_DEBUG:
+            print(f"Hotkeys grabbed: {directions}")
+        return directions
+
+    def handle_event(self, ev: event.AnyEvent) -> None:
+        """Reacts to a non-hotkey X event by dropping caches it makes stale."""
+        if ev.type == X.ConfigureNotify:
+            applied_at = self._applied_at.get(ev.window.id)
+            if (
+                applied_at is not None
+                and time.monotonic() - applied_at > SNAP_SETTLE_TIME
+            ):
+                # Moved, resized or maximized by something other than xlap, so
+                # the stored layout and display may both be stale; real events
+                # cannot tell which display it is on, so re-query on next snap
+                self._forget_window(ev.window.id)
+                return
+            display = self._window_display_cache.get(ev.window.id)
+            # Only synthetic events (ICCCM 4.1.5) carry root coordinates; real
+            # ones are relative to the WM frame and say nothing about the display
+            if (
+                ev.send_event
+                and display is not None
+                and not (
+                    display["x_start"] <= ev.x < display["x_end"]
+                    and display["y_start"] <= ev.y < display["y_end"]
+                )
+            ):
+                del self._window_display_cache[ev.window.id]
+                # Its layout was relative to the display it has just left
+                self._window_state.pop(ev.window.id, None)
+                self._applied_at.pop(ev.window.id, None)
+        elif ev.type == X.DestroyNotify:
+            self._forget_window(ev.window.id)
+        elif (
+            self._randr_event_base is not None
+            and ev.type == self._randr_event_base + randr.RRScreenChangeNotify
+        ):
+            self._invalidate_displays()
+            # Snapped geometry was computed for the old monitor layout
+            self._window_state.clear()
+            self._applied_at.clear()
+
+    def get_active_window_id(self) -> int | None:
+        """Gets the ID of the focused client (top-level) window."""
+        # EWMH window managers publish the active client on the root window
+        active = self._root.get_full_property(
+            self._net_active_window, X.AnyPropertyType
+        )
+        if active and len(active.value) and active.value[0] != X.NONE:
+            return int(active.value[0])
+
+        focus = self._xdisplay.get_input_focus().focus
+        # Focus may be None or PointerRoot, neither of which can be tiled
+        if isinstance(focus, int) or focus.id in (X.NONE, X.PointerRoot):
+            return None
+        if focus.id == self._root.id:
+            return None
+        return self._find_client_window(focus)
+
+    def _find_client_window(self, window: Window) -> int:
+        """Walks up from a focused child to the client window the WM manages.
+
+        Some toolkits focus an internal child window; moving that would only
+        move a widget inside the app. Falls back to the window itself.
+        """
+        current = window
+        try:
+            while current.id != self._root.id:
+                # ICCCM: the window manager sets WM_STATE on client windows
+                if current.get_full_property(self._wm_state, X.AnyPropertyType):
+                    return current.id
+                current = current.query_tree().parent
+        except XError as e:
             if XLAP_DEBUG:
-                print(f"Command not found: {cmd}")
-            return ""
-        except subprocess.CalledProcessError as e:
+                print(f"Could not walk up from window {window.id}: {e}")
+        return window.id
+
+    def get_window_position(self, window_id: int) -> tuple[int, int] | None:
+        """Gets the (left, top) position of a window."""
+        window = self._xdisplay.create_resource_object("window", window_id)
+        try:
+            geom = window.get_geometry()
+            origin = geom.root.translate_coords(window, 0, 0)
+        except XError as e:
             if XLAP_DEBUG:
-                print(f"Command failed: {cmd}\nError: {e.stderr}")
-            return ""
+                print(f"Could not query geometry of window {window_id}: {e}")
+            return None
+        return max(0, origin.x), max(0, origin.y)
 
-    def get_active_window_id(self) -> Optional[str]:
-        """Gets the ID of the currently focused window."""
-        return self._run_command(["xdotool", "getwindowfocus"]) or None
+    def _invalidate_displays(self) -> None:
+        """Drops the cached display geometry so the next lookup re-reads it."""
+        self._displays_cache = None
+        self._geom_cache.clear()
+        self._window_display_cache.clear()
+        if XLAP_DEBUG:
+            print("Display cache invalidated.")
+
+    def _rebuild_geometry(self) -> None:
+        """Recomputes the layout geometry, e.g. after the margins changed."""
+        if self._displays_cache is not None:
+            self._build_geometry(self._displays_cache)
+
+    def get_connected_displays(self) -> list[dict[str, int]]:
+        """Returns connected display geometries, cached until the screen changes."""
+        if self._displays_cache is None:
+            self._displays_cache = self._query_displays()
+            self._build_geometry(self._displays_cache)
+        return self._displays_cache
+
+    def _build_geometry(self, displays: list[dict[str, int]]) -> None:
+        """Precomputes the pixel geometry of every layout on every display."""
+        self._geom_cache.clear()
+        for display in displays:
+            screen_w = display["width"] - Config.screen_margin_right
+            screen_h = display["height"] - Config.screen_margin_bottom
+            for layout, (x_f, y_f, w_f, h_f) in LAYOUT_GEOMETRY.items():
+                width = int(screen_w * w_f) - Config.window_margin_left
+                height = int(screen_h * h_f) - Config.window_margin_top
+                left = (
+                    display["offset_left"]
+                    + int(screen_w * x_f)
+                    + Config.window_margin_left
+                )
+                top = (
+                    display["offset_top"]
+                    + int(screen_h * y_f)
+                    + Config.window_margin_top
+                )
+                self._geom_cache[(display["index"], layout)] = (
+                    left,
+                    top,
+                    width,
+                    height,
+                )
+
+    def _query_displays(self) -> list[dict[str, int]]:
+        """Reads the geometry of every active CRTC through XRandR."""
+        if self._randr_event_base is None:
+            screen = self._xdisplay.screen()
+            geometries = [(0, 0, screen.width_in_pixels, screen.height_in_pixels)]
+        else:
+            res = self._root.xrandr_get_screen_resources_current()
+            geometries = []
+            for crtc in res.crtcs:
+                info = self._xdisplay.xrandr_get_crtc_info(crtc, res.config_timestamp)
+                # CRTCs without a mode are not driving any output
+                if info.mode != 0:
+                    geometries.append((info.x, info.y, info.width, info.height))
 
-    def get_window_position(self, window_id: str) -> Optional[Tuple[int, int]]:
-        """Gets the (left, top) position of a window."""
-        output = self._run_command(["xdotool", "getwindowgeometry", window_id])
-        match = re.search(r"Position: (\d+),(\d+)", output)
-        if match:
-            left, top = int(match.group(1)), int(match.group(2))
-            return max(0, left), max(0, top)
-        return None
-
-    def get_connected_displays(self) -> List[Dict[str, int]]:
-        """Parses xrandr output to find connected display geometries."""
-        output = self._run_command(["xrandr"])
         displays = []
-        pattern = re.compile(r" connected(?: primary)? (\d+)x(\d+)\+(\d+)\+(\d+)")
-        for line in output.splitlines():
-            match = pattern.search(line)
-            if match:
-                w, h, ox, oy = map(int, match.groups())
-                displays.append(
-                    {
-                        "x_start": ox,
-                        "x_end": ox + w,
-                        "y_start": oy,
-                        "y_end": oy + h,
-                        "offset_left": ox,
-                        "offset_top": oy,
-                        "width": w,
-                        "height": h,
-                    }
-                )
+        for index, (ox, oy, w, h) in enumerate(geometries):
+            displays.append(
+                {
+                    "index": index,
+                    "x_start": ox,
+                    "x_end": ox + w,
+                    "y_start": oy,
+                    "y_end": oy + h,
+                    "offset_left": ox,
+                    "offset_top": oy,
+                    "width": w,
+                    "height": h,
+                }
+            )
         if XLAP_DEBUG:
             print(f"Displays found: {displays}")
         return displays
 
-    def get_display_for_window(self, window_id: str) -> Optional[Dict[str, int]]:
+    def get_display_for_window(self, window_id: int) -> dict[str, int] | None:
         """Finds which display a given window is on."""
+        display = self._window_display_cache.get(window_id)
+        if display is not None:
+            return display
+
         pos = self.get_window_position(window_id)
         if not pos:
             return None
         left, top = pos
 
-        for display in self.get_connected_displays():
+        displays = self.get_connected_displays()
+        for display in displays:
             if (
                 display["x_start"] <= left < display["x_end"]
                 and display["y_start"] <= top < display["y_end"]
             ):
                 if XLAP_DEBUG:
                     print(f"Window {window_id} is on display: {display}")
+                self._watch_window(window_id)
+                self._window_display_cache[window_id] = display
                 return display
 
-        displays = self.get_connected_displays()
         return displays[0] if displays else None
 
-    def _set_window_state(self, window_id: str, state_action: str, state_prop: str):
-        self._run_command(
-            ["xdotool", "windowstate", state_action, state_prop, window_id]
+    def _watch_window(self, window_id: int) -> None:
+        """Selects ConfigureNotify/DestroyNotify on a window not yet tracked."""
+        if window_id in self._window_state or window_id in self._window_display_cache:
+            return
+        window = self._xdisplay.create_resource_object("window", window_id)
+        # The window may already be gone; its DestroyNotify is then moot too
+        window.change_attributes(
+            event_mask=X.StructureNotifyMask, onerror=CatchError(BadWindow)
         )
 
-    def apply_layout(self, layout: str, window_id: str) -> None:
-        """Applies a given layout to a window."""
+    def _remember_layout(self, window_id: int, layout_index: int) -> None:
+        """Records a window's layout, evicting the least recently tiled window."""
+        self._watch_window(window_id)
+        self._window_state[window_id] = layout_index
+        self._window_state.move_to_end(window_id)
+        self._applied_at[window_id] = time.monotonic()
+        if len(self._window_state) > WINDOW_STATE_LIMIT:
+            evicted, _ = self._window_state.popitem(last=False)
+            self._applied_at.pop(evicted, None)
+            self._window_display_cache.pop(evicted, None)
+
+    def _forget_window(self, window_id: int) -> None:
+        """Drops everything remembered about a window."""
+        self._window_state.pop(window_id, None)
+        self._applied_at.pop(window_id, None)
+        self._window_display_cache.pop(window_id, None)
+
+    def _set_window_state(self, window_id: int, action: int, *states: str) -> None:
+        """Queues a request to add or remove _NET_WM_STATE flags.
+
+        Nothing is sent until the display is flushed.
+        """
+        window = self._xdisplay.create_resource_object("window", window_id)
+        atoms = [self._state_atoms[state] for state in states]
+        # Each client message carries at most two properties
+        for i in range(0, len(atoms), 2):
+            first, second = (atoms[i : i + 2] + [0])[:2]
+            message = event.ClientMessage(
+                window=window,
+                client_type=self._net_wm_state,
+                data=(32, [action, first, second, 1, 0]),
+            )
+            self._root.send_event(
+                message,
+                event_mask=X.SubstructureRedirectMask | X.SubstructureNotifyMask,
+            )
+
+    def apply_layout(self, layout: str, window_id: int, force: bool = False) -> None:
+        """Applies a given layout to a window.
+
+        Does nothing if the window already has that layout, unless forced.
+        """
         if not window_id:
             return
         if XLAP_DEBUG:
             print(f"Applying layout '{layout}' to window {window_id}")
 
-        if layout not in LAYOUT_SEQUENCE:
+        layout_index = LAYOUT_INDEX.get(layout)
+        if layout_index is None:
             if XLAP_DEBUG:
                 print(
                     f"Warning: Layout '{layout}' not in LAYOUT_SEQUENCE. Defaulting to index 0."
                 )
-            self._window_state[window_id] = 0
-        else:
-            self._window_state[window_id] = LAYOUT_SEQUENCE.index(layout)
+            layout_index = 0
+        if not force and self._window_state.get(window_id) == layout_index:
+            if XLAP_DEBUG:
+                print(f"Window {window_id} already has layout '{layout}', skipping.")
+            return
 
         if layout == Layouts.FULL_SCREEN:
-            self._set_window_state(window_id, "--add", "fullscreen")
+            self._set_window_state(window_id, _NET_WM_STATE_ADD, "fullscreen")
         elif layout == Layouts.MAXIMIZED:
-            self._set_window_state(window_id, "--remove", "fullscreen")
-            self._set_window_state(window_id, "--add", "maximized_vert,maximized_horz")
+            self._set_window_state(window_id, _NET_WM_STATE_REMOVE, "fullscreen")
+            self._set_window_state(
+                window_id, _NET_WM_STATE_ADD, "maximized_vert", "maximized_horz"
+            )
         else:
             display = self.get_display_for_window(window_id)
             if not display:
                 Notify.send("Layout Error", f"Display not found for window {window_id}")
                 return
 
-            geom = LAYOUT_GEOMETRY.get(layout)
+            geom = self._geom_cache.get((display["index"], layout))
             if not geom:
                 if XLAP_DEBUG:
                     print(f"Error: No geometry defined for layout '{layout}'")
                 return
-
-            screen_w = display["width"] - Config.screen_margin_right
-            screen_h = display["height"] - Config.screen_margin_bottom
-            x_f, y_f, w_f, h_f = geom
-
-            width = int(screen_w * w_f) - Config.window_margin_left
-            height = int(screen_h * h_f) - Config.window_margin_top
-            left = (
-                display["offset_left"] + int(screen_w * x_f) + Config.window_margin_left
-            )
-            top = display["offset_top"] + int(screen_h * y_f) + Config.window_margin_top
+            left, top, width, height = geom
 
             self._set_window_state(
-                window_id, "--remove", "fullscreen,maximized_vert,maximized_horz"
+                window_id,
+                _NET_WM_STATE_REMOVE,
+                "fullscreen",
+                "maximized_vert",
+                "maximized_horz",
             )
-            self._run_command(
-                ["xdotool", "windowsize", window_id, str(width), str(height)]
-            )
-            self._run_command(["xdotool", "windowmove", window_id, str(left), str(top)])
+            window = self._xdisplay.create_resource_object("window", window_id)
+            window.configure(x=left, y=top, width=width, height=height)
+
+        # Only record the layout once its requests are queued, so a failed
+        # lookup above does not make later presses of the same key no-ops
+        self._remember_layout(window_id, layout_index)
+        # Send the state change and move/resize to the server in one write
+        self._xdisplay.flush()
 
         if Config.notify_on_apply_layout:
             Notify.send(layout)
 
-    def modify_layout(self, direction: str) -> None:
-        """Applies a new layout based on the current one and a direction."""
+    def modify_layout(self, direction: int) -> None:
+        """Applies a new layout based on the current one and a direction index."""
         active_window = self.get_active_window_id()
         if not active_window:
             return
 
         # Get the current layout name from the stored state index
         # Default to 'Maximized' if no state is recorded yet.
-        last_layout_index = self._window_state.get(
-            active_window, LAYOUT_SEQUENCE.index(Layouts.MAXIMIZED)
-        )
-        current_layout = LAYOUT_SEQUENCE[last_layout_index]
+        last_layout_index = self._window_state.get(active_window, _MAXIMIZED_IDX)
 
         if XLAP_DEBUG:
             print(
-                f"\nModifying layout. Current: '{current_layout}', Direction: '{direction}'"
+                f"\nModifying layout. Current: '{LAYOUT_SEQUENCE[last_layout_index]}', "
+                f"Direction: '{DIRECTIONS[direction]}'"
             )
 
-        # Look for a specific transition (e.g., from 50% Right + up -> Top Right)
-        transition_key = (current_layout, direction)
-        new_layout = LAYOUT_TRANSITIONS.get(transition_key)
-
-        # If no specific transition is found, use the default for the direction
-        if not new_layout:
-            new_layout = DEFAULT_TRANSITIONS.get(direction)
-
-        if new_layout:
-            if XLAP_DEBUG:
-                print(f"Transitioning to new layout: '{new_layout}'")
-            self.apply_layout(layout=new_layout, window_id=active_window)
-        elif XLAP_DEBUG:
-            print("No valid transition found.")
+        # Specific transitions (e.g., from 50% Right + up -> Top Right) and the
+        # per-direction defaults are both folded into TRANSITION_TABLE
+        new_layout = LAYOUT_SEQUENCE[TRANSITION_TABLE[last_layout_index][direction]]
 
-
-# --- Hotkey Listener ---
-class HotkeyListener(Thread):
-    """Listens for global hotkeys in a separate thread."""
-
-    def __init__(self, core: XlapCore):
-        super().__init__(daemon=True)
-        self._core = core
-
-        self.hotkeys = {
-            "<cmd>+<alt>+<left>": partial(self._core.modify_layout, "left"),
-            "<cmd>+<alt>+<right>": partial(self._core.modify_layout, "right"),
-            "<cmd>+<alt>+<up>": partial(self._core.modify_layout, "up"),
-            "<cmd>+<alt>+<down>": partial(self._core.modify_layout, "down"),
-        }
-
-    def run(self) -> None:
         if XLAP_DEBUG:
-            print(f"HotkeyListener: Starting with hotkeys: {list(self.hotkeys.keys())}")
-        with keyboard.GlobalHotKeys(self.hotkeys) as h:
-            h.join()
+            print(f"Transitioning to new layout: '{new_layout}'")
+        self.apply_layout(layout=new_layout, window_id=active_window)
 
 
 # --- System Tray Indicator ---
@@ -533,8 +858,12 @@ class IndicatorApp:
         {"label": "Exit", "action": "exit"},
     ]
 
+    # Entry kinds in a compiled menu spec of (kind, label, payload) tuples
+    _SEPARATOR, _HEADER, _SUBMENU, _LAYOUT, _ACTION = range(5)
+
     def __init__(self, core: XlapCore):
         self._core = core
+        self._menu_spec = self._bind_menu(self._MENU_SPEC)
         self.indicator = AppIndicator3.Indicator.new(
             "xlap",
             "view-grid-symbolic",
@@ -545,82 +874,159 @@ class IndicatorApp:
         self.indicator.set_icon_full("view-grid-symbolic", "Window snap assistant")
         self.indicator.set_menu(self._build_menu())
 
-    def _build_menu_items(self, items: List[Dict[str, Any]]) -> Gtk.Menu:
-        """Recursively builds a GTK menu from a list of dictionaries."""
-        menu = Gtk.Menu()
+    @classmethod
+    def _compile_menu(cls, items: list[dict]) -> list[tuple]:
+        """Resolves MENU_STRUCTURE into (kind, label, payload) tuples.
+
+        Action payloads are the unbound handler functions; layout payloads
+        are the layout name and submenu payloads the compiled submenu.
+        """
+        compiled = []
         for item_def in items:
             item_type = item_def.get("type")
             label = item_def.get("label", "")
 
             if item_type == "separator":
+                compiled.append((cls._SEPARATOR, label, None))
+            elif "submenu" in item_def:
+                submenu = cls._compile_menu(item_def["submenu"])
+                compiled.append((cls._SUBMENU, label, submenu))
+            elif item_type == "header":
+                compiled.append((cls._HEADER, label, None))
+            elif item_type == "layout":
+                compiled.append((cls._LAYOUT, label, label))
+            else:  # Actionable item
+                action_name = item_def.get("action")
+                handler = getattr(cls, f"_action_{action_name}", None)
+                compiled.append((cls._ACTION, label, handler))
+        return compiled
+
+    def _bind_menu(self, spec: list[tuple]) -> list[tuple]:
+        """Binds the action handlers of a compiled menu spec to this instance."""
+        bound = []
+        for kind, label, payload in spec:
+            if kind == self._SUBMENU:
+                payload = self._bind_menu(payload)
+            elif kind == self._ACTION and payload is not None:
+                payload = types.MethodType(payload, self)
+            bound.append((kind, label, payload))
+        return bound
+
+    def _build_menu_items(
+        self, spec: list[tuple], menu: Gtk.Menu | None = None
+    ) -> Gtk.Menu:
+        """Builds a GTK menu from a bound menu spec.
+
+        Submenus start out empty and are filled in when first opened.
+        """
+        if menu is None:
+            menu = Gtk.Menu()
+        for kind, label, payload in spec:
+            if kind == self._SEPARATOR:
                 menu.append(Gtk.SeparatorMenuItem())
                 continue
 
             menu_item = Gtk.MenuItem(label=label)
 
-            if "submenu" in item_def:
-                submenu = self._build_menu_items(item_def["submenu"])
+            if kind == self._SUBMENU:
+                submenu = Gtk.Menu()
                 menu_item.set_submenu(submenu)
-            elif item_type == "header":
+                for signal_name in ("select", "activate"):
+                    menu_item.connect(
+                        signal_name, self._on_submenu_open, submenu, payload
+                    )
+            elif kind == self._HEADER:
                 menu_item.set_sensitive(False)
-            else:  # Actionable item
-                action_name = item_def.get("action")
-                if item_type == "layout":
-                    menu_item.connect("activate", self._on_layout_activate, label)
-                elif action_name:
-                    action_handler = getattr(self, f"_action_{action_name}", None)
-                    if action_handler:
-                        menu_item.connect("activate", action_handler)
+            elif kind == self._LAYOUT:
+                menu_item.connect("activate", self._on_layout_activate, payload)
+            elif payload is not None:
+                menu_item.connect("activate", payload)
             menu.append(menu_item)
         return menu
 
     def _build_menu(self) -> Gtk.Menu:
-        menu = self._build_menu_items(self.MENU_STRUCTURE)
+        menu = self._build_menu_items(self._menu_spec)
         menu.show_all()
         return menu
 
+    def _on_submenu_open(
+        self, _: Gtk.MenuItem, submenu: Gtk.Menu, spec: list[tuple]
+    ) -> None:
+        """Fills a placeholder submenu the first time its parent is opened."""
+        if submenu.get_children():
+            return
+        self._build_menu_items(spec, submenu)
+        submenu.show_all()
+
     def _on_layout_activate(self, _: Gtk.MenuItem, layout_name: str) -> None:
         active_window = self._core.get_active_window_id()
         if active_window:
-            self._core.apply_layout(layout=layout_name, window_id=active_window)
+            # An explicit menu choice re-applies, e.g. after a manual move
+            self._core.apply_layout(
+                layout=layout_name, window_id=active_window, force=True
+            )
 
     def _action_snap_left(self, _: Gtk.MenuItem) -> None:
-        self._core.modify_layout("left")
+        self._core.modify_layout(DIRECTION_INDEX["left"])
 
     def _action_snap_right(self, _: Gtk.MenuItem) -> None:
-        self._core.modify_layout("right")
+        self._core.modify_layout(DIRECTION_INDEX["right"])
 
     def _action_snap_up(self, _: Gtk.MenuItem) -> None:
-        self._core.modify_layout("up")
+        self._core.modify_layout(DIRECTION_INDEX["up"])
 
     def _action_snap_down(self, _: Gtk.MenuItem) -> None:
-        self._core.modify_layout("down")
+        self._core.modify_layout(DIRECTION_INDEX["down"])
 
     def _action_settings(self, _: Gtk.MenuItem) -> None:
-        subprocess.Popen(["xdg-open", str(Config.get_path())])
+        spawn_detached(["xdg-open", str(Config.get_path())])
 
     def _action_reload_config(self, _: Gtk.MenuItem) -> None:
-        Config.load()
+        if Config.load():
+            # Margins may have changed, so the precomputed geometry is stale
+            self._core._rebuild_geometry()
         Notify.send("Xlap Config Reloaded")
 
     def _action_about(self, _: Gtk.MenuItem) -> None:
-        subprocess.Popen(["xdg-open", "https://gitlab.com/sri-at-gitlab/projects/xlap"])
+        spawn_detached(["xdg-open", "https://gitlab.com/sri-at-gitlab/projects/xlap"])
 
     def _action_exit(self, _: Gtk.MenuItem) -> None:
         Gtk.main_quit()
 
 
+# Resolved once, so building the menu needs no per-item dispatch by name
+IndicatorApp._MENU_SPEC = IndicatorApp._compile_menu(IndicatorApp.MENU_STRUCTURE)
+
+
 # --- Notification Utility ---
 class Notify:
-    @staticmethod
+    # Reused for every message so each send is a single D-Bus call
+    _notification = None
+
+    @classmethod
     def send(
+        cls,
         summary: str,
         description: str = "",
         icon: str = "preferences-desktop-display",
         expire_time: int = 2000,
     ):
+        if cls._notification is None and GNotify:
+            cls._notification = GNotify.Notification.new(
+                "Xlap", "", "preferences-desktop-display"
+            )
+        if cls._notification is not None:
+            try:
+                cls._notification.update(summary, description, icon)
+                cls._notification.set_timeout(expire_time)
+                cls._notification.show()
+                return
+            except GLib.Error as e:
+                if XLAP_DEBUG:
+                    print(f"libnotify failed, falling back to notify-send: {e}")
+
         try:
-            subprocess.run(
+            pid = spawn(
                 [
                     "notify-send",
                     "--icon",
@@ -631,10 +1037,12 @@ class Notify:
                     str(expire_time),
                     summary,
                     description,
-                ],
-                check=True,
+                ]
             )
-        except (FileNotFoundError, subprocess.CalledProcessError) as e:
+            exit_code = os.waitstatus_to_exitcode(os.waitpid(pid, 0)[1])
+            if exit_code != 0:
+                raise OSError(f"notify-send exited with status {exit_code}")
+        except OSError as e:
             if XLAP_DEBUG:
                 print(
                     f"Notification failed: {e}\nSummary: {summary}\nDesc: {description}"
@@ -644,19 +1052,16 @@ class Notify:
 # --- Main Execution ---
 def check_dependencies():
     """Checks for required command-line tools."""
-    deps = ["xdotool", "xrandr", "notify-send"]
-    missing = [
-        dep
-        for dep in deps
-        if subprocess.run(["which", dep], capture_output=True).returncode != 0
-    ]
+    # notify-send is only needed when the libnotify bindings are missing
+    deps = [] if GNotify else ["notify-send"]
+    missing = [dep for dep in deps if shutil.which(dep) is None]
     if missing:
         print(
             f"Error: Missing required command(s): {', '.join(missing)}.",
             file=sys.stderr,
         )
         print(
-            "On Debian/Kali, install them with: sudo apt install xdotool libnotify-bin",
+            "On Debian/Kali, install them with: sudo apt install libnotify-bin",
             file=sys.stderr,
         )
         sys.exit(1)
@@ -664,13 +1069,33 @@ def check_dependencies():
 
 def main():
     """Main function to initialize and run the application."""
+    _load_gtk()
     check_dependencies()
     Config.load()
     core = XlapCore()
     signal.signal(signal.SIGINT, lambda s, f: Gtk.main_quit())
     signal.signal(signal.SIGTERM, lambda s, f: Gtk.main_quit())
-    hotkey_thread = HotkeyListener(core)
-    hotkey_thread.start()
+    # SIGUSR1 forces a display re-scan, e.g. if a hotplug event was missed
+    signal.signal(signal.SIGUSR1, lambda s, f: core._invalidate_displays())
+    xdisplay = core.xdisplay
+    direction_from_keycode = core.grab_hotkeys()
+
+    def pump_x(*_) -> bool:
+        """Dispatches every queued X event from the GTK main loop."""
+        while xdisplay.pending_events():
+            ev = xdisplay.next_event()
+            if ev.type == X.KeyPress:
+                direction = direction_from_keycode.get(ev.detail)
+                if direction is not None:
+                    core.modify_layout(direction)
+            else:
+                core.handle_event(ev)
+        return True  # Keep watching
+
+    GLib.io_add_watch(xdisplay.fileno(), GLib.PRIORITY_DEFAULT, GLib.IO_IN, pump_x)
+    # Replies read so far may have queued events without leaving the socket
+    # readable, so drain once up front
+    pump_x()
     IndicatorApp(core)
     if Config.notify_on_launch:
         Notify.send("Xlap launched", "Context-aware tiling is active.")